@@ -2,6 +2,35 @@ import pandas as pd
 import yaml
 import os
 
+__all__ = ["read_input", "read_params", "read_multi_obs_input"]
+
+# Prefer the libyaml-backed C loader when PyYAML was built with it; it parses
+# identically to SafeLoader but several times faster.
+_YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+# Parsed parameter files keyed by (absolute path, mtime) so repeated runs
+# against the same file skip the parse entirely, while edits invalidate.
+_parsed_params_cache = {}
+
+
+def _read_csv(path, **kwargs):
+    """Read a CSV with the pyarrow engine when available (faster parse and
+    arrow-backed string columns), falling back to the default engine."""
+    try:
+        return pd.read_csv(path, engine="pyarrow", dtype_backend="pyarrow", **kwargs)
+    except ImportError:
+        return pd.read_csv(path, **kwargs)
+
+
+def _read_excel(path, sheet_name=None):
+    """Read a workbook with the calamine engine when available (an order of
+    magnitude faster than openpyxl on large sheets), falling back to the
+    pandas default."""
+    try:
+        return pd.read_excel(path, sheet_name=sheet_name, engine="calamine")
+    except ImportError:
+        return pd.read_excel(path, sheet_name=sheet_name)
+
 
 def read_input(data, sheet_name=None):
     """
@@ -32,11 +61,13 @@ def read_input(data, sheet_name=None):
         ext = os.path.splitext(data)[-1].lower()
 
         if ext in [".csv"]:
-            df = pd.read_csv(data)
+            df = _read_csv(data)
         elif ext in [".tsv", ".txt"]:
+            # whitespace separators are regexes, which the pyarrow engine
+            # does not support
             df = pd.read_csv(data, sep=r"\s+")
         elif ext in [".xlsx", ".xls"]:
-            df = pd.read_excel(data, sheet_name=sheet_name)
+            df = _read_excel(data, sheet_name=sheet_name)
         else:
             raise ValueError(f"Unsupported file type: {ext}")
 
@@ -48,11 +79,12 @@ def read_input(data, sheet_name=None):
     # Handle single-column input automatically
     if df.shape[1] == 1:
         col = df.columns[0]
-        df["MIC"] = df[col].astype(str).str.strip()
-        
         df = (
-            df.groupby("MIC")
-            .size()
+            df[col]
+            .astype(str)
+            .str.strip()
+            .value_counts()
+            .rename_axis("MIC")
             .reset_index(name="observations")
         )
 
@@ -66,15 +98,42 @@ def read_input(data, sheet_name=None):
         )
 
     df["MIC"] = df["MIC"].astype(str).str.strip()
-    df["observations"] = (
-        pd.to_numeric(df["observations"], errors="coerce")
-        .fillna(0)
-        .astype(int)
-    )
+    if not pd.api.types.is_integer_dtype(df["observations"]):
+        df["observations"] = (
+            pd.to_numeric(df["observations"], errors="coerce")
+            .fillna(0)
+            .astype(int)
+        )
 
     df = df.dropna(subset=["MIC"]).reset_index(drop=True)
     return df
 
+def _parse_txt_params(path):
+    """Parse a `key = value` text parameter file into a dict, casting the
+    known numeric keys."""
+    parsed = {}
+    with open(path, "r") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            key, val = [x.strip() for x in line.split("=", 1)]
+            if key == "dilution_factor":
+                parsed[key] = int(val)
+            elif key == "boundary_support":
+                if val.lower() == "none":
+                    parsed[key] = None
+                else:
+                    parsed[key] = int(val)
+            elif key == "distributions":
+                parsed[key] = int(val)
+            elif key == "percentile":
+                parsed[key] = float(val)
+            else:
+                parsed[key] = val
+    return parsed
+
+
 def read_params(params, dflt_dilution, dflt_dists, dflt_tails):
     """
     Read ECOFF model parameters from a file or dictionary, falling back to provided defaults.
@@ -101,31 +160,19 @@ def read_params(params, dflt_dilution, dflt_dists, dflt_tails):
 
         ext = os.path.splitext(params)[-1].lower()
 
-        if ext in [".yaml", ".yml"]:
+        cache_key = (os.path.abspath(params), os.path.getmtime(params))
+        if cache_key in _parsed_params_cache:
+            params = _parsed_params_cache[cache_key]
+
+        elif ext in [".yaml", ".yml"]:
             with open(params, "r") as f:
-                params = yaml.safe_load(f) or {}
+                parsed = yaml.load(f, Loader=_YAML_LOADER) or {}
+            _parsed_params_cache[cache_key] = parsed
+            params = parsed
 
         elif ext == ".txt":
-            parsed = {}
-            with open(params, "r") as f:
-                for line in f:
-                    line = line.strip()
-                    if not line or line.startswith("#"):
-                        continue
-                    key, val = [x.strip() for x in line.split("=", 1)]
-                    if key == "dilution_factor":
-                        parsed[key] = int(val)
-                    elif key == "boundary_support":
-                        if val.lower() == "none":
-                            parsed[key] = None
-                        else:
-                            parsed[key] = int(val)
-                    elif key == "distributions":
-                        parsed[key] = int(val)
-                    elif key == "percentile":
-                        parsed[key] = float(val)
-                    else:
-                        parsed[key] = val
+            parsed = _parse_txt_params(params)
+            _parsed_params_cache[cache_key] = parsed
             params = parsed
         else:
             raise ValueError(f"Unsupported file type: {ext}")
@@ -175,11 +222,11 @@ def read_multi_obs_input(data, sheet_name=None):
         ext = os.path.splitext(data)[-1].lower()
 
         if ext == ".csv":
-            df = pd.read_csv(data)
+            df = _read_csv(data)
         elif ext in [".tsv", ".txt"]:
             df = pd.read_csv(data, sep=r"\s+")
         elif ext in [".xlsx", ".xls"]:
-            df = pd.read_excel(data, sheet_name='Sheet1')
+            df = _read_excel(data, sheet_name="Sheet1")
         else:
             raise ValueError(f"Unsupported file type: {ext}")
 
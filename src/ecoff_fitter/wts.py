@@ -1,43 +1,123 @@
+import functools
+import os
+from collections import defaultdict
+
+import numpy as np
 import pandas as pd
 import multiprocessing as mp
 import sys
-from joblib import Memory
 import piezo
 
 
-memory = Memory(location=".piezo_cache", verbose=0)
-memory.clear(warn=False)
-
-_catalogue_cache = {}
+@functools.lru_cache(maxsize=8)
+def _load_catalogue(catalogue_path, mtime):
+    return piezo.ResistanceCatalogue(catalogue_path)
 
 
 def get_catalogue(catalogue_path):
-    """Load and cache the catalogue once per process."""
-    global _catalogue_cache
-    if catalogue_path not in _catalogue_cache:
-        _catalogue_cache[catalogue_path] = piezo.ResistanceCatalogue(catalogue_path)
-    return _catalogue_cache[catalogue_path]
+    """Load and cache the catalogue once per process, keyed on file mtime
+    so a swapped-out catalogue at the same path is re-read."""
+    return _load_catalogue(
+        os.path.abspath(catalogue_path), os.path.getmtime(catalogue_path)
+    )
+
+
+# Antibiogram calls as small integer codes, ordered so that a larger code
+# always dominates ("R" beats "U" beats "S") and the final reduction can be
+# done with numpy comparisons.
+CALL_CODES = {"S": 0, "U": 1, "R": 2}
+
+# Per-worker lookup tables, populated once by _init_worker so they are not
+# pickled into every task.
+_DRUG_GENES = None
+_GENE_TO_DRUGS = None
+_PREDICTIONS = None
+
+
+def _init_worker(drug_genes, gene_to_drugs, predictions):
+    global _DRUG_GENES, _GENE_TO_DRUGS, _PREDICTIONS
+    _DRUG_GENES = drug_genes
+    _GENE_TO_DRUGS = gene_to_drugs
+    _PREDICTIONS = predictions
 
 
 class gWTBase:
 
+    @staticmethod
+    def build_prediction_table(mutations, gene_to_drugs, catalogue_path):
+        """Predict each unique mutation once and return a plain
+        {(mutation, drug): code} dict of CALL_CODES values, so the
+        per-isolate workers only do dict lookups. Only the drugs informed by
+        the mutation's gene are tabulated; every isolate sharing a mutation
+        reuses the same entry."""
+        catalogue = get_catalogue(catalogue_path)
+        predictions = {}
+
+        for mutation in mutations["MUTATION"].dropna().unique():
+            gene = mutation.split("@", 1)[0]
+            drugs = gene_to_drugs.get(gene, ())
+            if not drugs:
+                continue
+            result = catalogue.predict(mutation)
+            for drug in drugs:
+                call = result.get(drug, "S") if isinstance(result, dict) else result
+                predictions[(mutation, drug)] = CALL_CODES.get(call, 0)
+
+        return predictions
+
     @staticmethod
     def parallel_antibiogram(mutations, drug_genes, catalogue_path, cores=4):
-        mutations = mutations.set_index("UNIQUEID")
-        mut_by_uid = {
-            uid: df.reset_index() for uid, df in mutations.groupby("UNIQUEID")
-        }
+        # These columns are heavily repeated strings; categorical codes make
+        # the groupby cheaper and shrink what gets pickled to the workers.
+        mutations = mutations.astype(
+            {"UNIQUEID": "category", "GENE": "category", "MUTATION": "category"}
+        )
+
+        # Invert drug -> genes once, so each isolate is scanned in a single
+        # pass rather than once per drug.
+        gene_to_drugs = defaultdict(list)
+        for drug, genes in drug_genes.items():
+            for gene in genes:
+                gene_to_drugs[gene].append(drug)
+        gene_to_drugs = dict(gene_to_drugs)
 
-        tasks = []
-        for uid in mutations.index.unique():
-            iso_muts = mut_by_uid.get(uid, pd.DataFrame(columns=mutations.columns))
-            tasks.append((uid, iso_muts, drug_genes, catalogue_path))
+        predictions = gWTBase.build_prediction_table(
+            mutations, gene_to_drugs, catalogue_path
+        )
+
+        # Single grouping pass; every UNIQUEID yielded has at least one row,
+        # so no empty-DataFrame fallback is needed.
+        tasks = [
+            (uid, iso_muts)
+            for uid, iso_muts in mutations.groupby("UNIQUEID", sort=False, observed=True)
+        ]
+
+        if not tasks:
+            return {}
+
+        # For small batches the fork + pickling cost of a pool outweighs the
+        # work itself, so run serially.
+        if cores == 1 or len(tasks) < 1000:
+            _init_worker(drug_genes, gene_to_drugs, predictions)
+            results = [gWTBase.process_antibiogram(task) for task in tasks]
+            return {uid: calls for uid, calls in results}
 
         ctx = mp.get_context("fork" if sys.platform != "win32" else "spawn")
 
-        with ctx.Pool(min(cores, len(tasks))) as pool:
+        cores = min(cores, len(tasks))
+        # Aim for ~4 chunks per worker: large enough to amortise pickling,
+        # small enough to keep all workers busy.
+        chunksize = max(1, len(tasks) // (cores * 4))
+
+        with ctx.Pool(
+            cores,
+            initializer=_init_worker,
+            initargs=(drug_genes, gene_to_drugs, predictions),
+        ) as pool:
             results = list(
-                pool.imap_unordered(gWTBase.process_antibiogram, tasks, chunksize=10),
+                pool.imap_unordered(
+                    gWTBase.process_antibiogram, tasks, chunksize=chunksize
+                ),
             )
 
         antibiograms = {uid: calls for uid, calls in results}
@@ -46,57 +126,48 @@ class gWTBase:
 
     @staticmethod
     def process_antibiogram(args):
-        """Generate an antibiogram for one sample"""
-        uid, iso_muts, drug_genes, catalogue_path = args
-        results = []
-
-        for drug, genes in drug_genes.items():
-            muts = iso_muts[iso_muts.GENE.isin(genes)]
-
-            if muts.empty:
-                result = "S"
-            else:
-                preds = muts["MUTATION"].map(
-                    lambda var: (
-                        "S"
-                        if pd.isna(var)
-                        else gWTBase.cached_predict(var, drug, catalogue_path)
-                    )
-                )
-                result = (
-                    "R"
-                    if "R" in preds.values
-                    else ("U" if "U" in preds.values else "S")
-                )
-
-            results.append(result)
-
-        return (uid, results)
-
-    @staticmethod
-    @memory.cache
-    def cached_predict(mutation, drug, catalogue_path):
-        catalogue = get_catalogue(catalogue_path)
-        result = catalogue.predict(mutation)
-        return result.get(drug, "S") if isinstance(result, dict) else result
+        """Generate an antibiogram for one sample as a list of CALL_CODES
+        values, one per drug."""
+        uid, iso_muts = args
+
+        # One pass over the isolate's mutations, fanned out to the drugs each
+        # gene informs, instead of a boolean-mask scan per drug. The lookup
+        # tables come from the worker initializer. "R" (code 2) dominates, so
+        # once a drug is resistant its remaining mutations are skipped.
+        per_drug = {drug: 0 for drug in _DRUG_GENES}
+        for gene, mutation in zip(iso_muts["GENE"].values, iso_muts["MUTATION"].values):
+            for drug in _GENE_TO_DRUGS.get(gene, ()):
+                call = per_drug[drug]
+                if call == 2:
+                    continue
+                pred = _PREDICTIONS.get((mutation, drug), 0)
+                if pred > call:
+                    per_drug[drug] = pred
+
+        return (uid, list(per_drug.values()))
 
 
 class nonsilent_WT(gWTBase):
 
     def identify(self, df):
 
-        synonymous_ids, wt_ids = set(), set()
+        # A mutation is synonymous if the residues either side of the position
+        # match (e.g. rpoB@S450S). Computed vectorized over the whole column
+        # rather than per group; NaN rows don't count against a group.
+        tail = df["MUTATION"].str.rsplit("@", n=1).str[-1]
+        has_mut = df["MUTATION"].notna()
+        is_syn = (tail.str[0] == tail.str[-1]) | ~has_mut
+
+        grp = (
+            df.assign(has_mut=has_mut, is_syn=is_syn)
+            .groupby("UNIQUEID")
+            .agg(any_mut=("has_mut", "any"), all_syn=("is_syn", "all"))
+        )
 
-        # Group by 'UNIQUEID' to check mutations
-        for unique_id, group in df.groupby("UNIQUEID"):
-            mutations = group.MUTATION.dropna()
-            if mutations.empty:  # No mutations indicate wild-type
-                wt_ids.add(unique_id)
-            elif all(m.split("@")[-1][0] == m.split("@")[-1][-1] for m in mutations):
-                synonymous_ids.add(unique_id)  # All mutations are synonymous/silent
+        # Wild-type (no mutations) or all-synonymous isolates
+        wt_or_syn = ~grp["any_mut"] | grp["all_syn"]
 
-        # Mark as mutant if not in wild-type or synonymous sets
-        return df["UNIQUEID"].isin(synonymous_ids | wt_ids)
+        return df["UNIQUEID"].map(wt_or_syn).fillna(False)
 
 
 class erj2022_WT(gWTBase):
@@ -114,32 +185,41 @@ class erj2022_WT(gWTBase):
             cores=mp.cpu_count(),
         )
 
-        first_lines = slice(0, 4)
-        second_lines = slice(4, 9)
+        if not antibiograms:
+            return {}
 
-        gWT_samples = {
-            uid: (
-                all(pred == "S" for pred in results[first_lines])
-                and all(pred in {"S", "U"} for pred in results[second_lines])
-            )
-            for uid, results in antibiograms.items()
-        }
+        # Reduce all isolates at once: first-line drugs must be "S", second-
+        # line drugs at most "U" (codes 0 and <=1 respectively).
+        codes = np.fromiter(
+            (code for calls in antibiograms.values() for code in calls),
+            dtype=np.int8,
+            count=len(antibiograms) * len(self.drugs),
+        ).reshape(len(antibiograms), len(self.drugs))
 
-        return gWT_samples
+        mask = (codes[:, :4] == 0).all(axis=1) & (codes[:, 4:9] <= 1).all(axis=1)
+
+        return dict(zip(antibiograms.keys(), mask.tolist()))
 
     def inf_vars(self, mutations, cat_path):
 
-        cat = pd.read_csv(cat_path)
+        cat = pd.read_csv(
+            cat_path,
+            usecols=["MUTATION", "PREDICTION", "DRUG"],
+            dtype={"PREDICTION": "category", "DRUG": "category"},
+        )
 
         cat["GENE"] = cat["MUTATION"].str.split("@", n=1).str[0]
         R_genes = cat.loc[cat["PREDICTION"].eq("R"), "GENE"].unique()
         cat_R = cat[cat["GENE"].isin(R_genes)]
 
-        # Build mapping: drug -> unique resistant genes
-        drug_genes = {
-            drug: cat_R.loc[cat_R["DRUG"].eq(drug), "GENE"].unique()
-            for drug in self.drugs
-        }
+        # Build mapping: drug -> unique resistant genes, in one grouped pass
+        # rather than one boolean scan per drug
+        genes_by_drug = (
+            cat_R.groupby("DRUG", sort=False, observed=True)["GENE"]
+            .agg(lambda genes: genes.unique().tolist())
+            .to_dict()
+        )
+        drug_genes = {drug: genes_by_drug.get(drug, []) for drug in self.drugs}
 
         # filter mutations for those in relevant (R) genes
         mutations = mutations[mutations["GENE"].isin(R_genes)]